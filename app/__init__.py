@@ -1,13 +1,24 @@
 # app/__init__.py
 
 import os
-from flask import Flask
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
 from os import environ
 from flask_login import LoginManager
+from jinja2 import FileSystemBytecodeCache
+from .limits import Limiter
+from .passwords import PasswordHasher
+from .sharding import ShardRouter, ShardedSession
+from .uploads import ImageUploadRequest
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+shard_router = ShardRouter()
+limiter = Limiter()
+password_hasher = PasswordHasher()
 DB_NAME = "database.db"
 
 # --- Calculate the actual project root directory ---
@@ -22,22 +33,25 @@ UPLOAD_FOLDER_FULL_PATH = os.path.join(PROJECT_ROOT_DIR, UPLOAD_FOLDER_RELATIVE_
 
 FLASK_STATIC_FOLDER = os.path.join(PROJECT_ROOT_DIR, 'static')
 
-# --- ADD THESE DEBUG PRINTS (VERY IMPORTANT!) ---
-print(f"DEBUG: PROJECT_ROOT_DIR is: {PROJECT_ROOT_DIR}")
-print(f"DEBUG: UPLOAD_FOLDER_FULL_PATH (where files are saved) is: {UPLOAD_FOLDER_FULL_PATH}")
-print(f"DEBUG: FLASK_STATIC_FOLDER (where Flask serves static) is: {FLASK_STATIC_FOLDER}")
-# --- END DEBUG PRINTS ---
-
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 
-def create_app():
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """Jinja bytecode cache that creates its directory on first write rather than at startup."""
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def create_app(config=None):
     # --- THIS IS THE CRITICAL CHANGE: Pass static_folder ---
     app = Flask(__name__, static_folder=FLASK_STATIC_FOLDER) 
     # --- END CRITICAL CHANGE ---
 
     app.config['SECRET_KEY'] = 'hjshjhdjah kjshkjdhjs'
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
+    # Absolute path to instance/database.db, so Flask-SQLAlchemy doesn't create the folder at startup
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(app.instance_path, DB_NAME)}'
     
     # Use the full, correctly calculated path for UPLOAD_FOLDER in app.config
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER_FULL_PATH 
@@ -45,7 +59,26 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
     app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
 
+    # Uploads are checked from their headers while streaming (see uploads.py)
+    app.request_class = ImageUploadRequest
+    app.config['UPLOAD_MAX_IMAGE_DIMENSION'] = 8000
+    app.config['UPLOAD_MAX_IMAGE_PIXELS'] = 40 * 1000 * 1000
+    app.config['UPLOAD_SNIFF_LIMIT'] = 256 * 1024
+
+    # Overrides for benchmarks and one-off scripts (e.g. a temporary database)
+    if config:
+        app.config.update(config)
+
+    # Compiled templates are reused across worker restarts; the environment itself is created lazily
+    app.jinja_options = {
+        **app.jinja_options,
+        'bytecode_cache': TemplateBytecodeCache(os.path.join(app.instance_path, 'jinja_cache'))
+    }
+
+    shard_router.init_app(app) # Adds the shard binds, so it goes before db
     db.init_app(app)
+    limiter.init_app(app)
+    password_hasher.init_app(app)
 
     from .views import views
     from .auth import auth
@@ -55,9 +88,10 @@ def create_app():
     app.register_blueprint(auth, url_prefix='/')
     app.register_blueprint(group_bp, url_prefix='/')
 
-    from .models import User, Note, Group, PetImage, GroupMember
-    
-    create_database(app) # This will now use the correct full path from app.config
+    from .models import User
+
+    # Schema creation is explicit: run `flask --app main init-db` once before first use
+    app.cli.add_command(init_db_command)
 
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
@@ -71,18 +105,26 @@ def create_app():
 
 
 def create_database(app):
-    database_path = os.path.join(app.root_path, DB_NAME) # This path is usually fine for database.db
-    
-    # Get the UPLOAD_FOLDER from app.config (which now holds the full project-level path)
-    upload_path = app.config['UPLOAD_FOLDER'] 
-    
-    if not os.path.exists(upload_path):
-        os.makedirs(upload_path)
-        print(f"Created upload directory: {upload_path}") # This should now print the correct path
-
-    if not os.path.exists(database_path):
-        with app.app_context():
-            db.create_all()
-            print('Created Database!')
-    else:
-        print('Database already exists!')
\ No newline at end of file
+    """Creates the upload folder and any missing tables. Safe to run more than once."""
+    from . import models # Registers every table on db.metadata
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Only create folders the configured SQLite files live in (instance/ by default)
+    uris = [app.config['SQLALCHEMY_DATABASE_URI'], *(app.config.get('SQLALCHEMY_BINDS') or {}).values()]
+    for uri in uris:
+        url = make_url(uri['url'] if isinstance(uri, dict) else uri)
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+    with app.app_context():
+        shard_router.create_all(db)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database tables and upload folder."""
+    try:
+        create_database(current_app)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo('Initialized the database.')
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from .models import User
-from werkzeug.security import generate_password_hash, check_password_hash
-from . import db
+from . import db, password_hasher
+from .limits import too_many_requests
+from .passwords import PasswordHasherBusy
 from flask_login import login_user, login_required, logout_user, current_user # <--- Ensure these are imported
 
 auth = Blueprint('auth', __name__)
@@ -16,7 +17,19 @@ def login():
         user = User.query.filter_by(userName=userName).first()
 
         if user:
-            if check_password_hash(user.password, password): 
+            try:
+                password_ok = password_hasher.verify(user.password, password)
+            except PasswordHasherBusy:
+                return too_many_requests(1, "Too many logins right now. Please try again in a moment.")
+
+            if password_ok:
+                try:
+                    if password_hasher.needs_rehash(user.password):
+                        # Hash settings changed since this password was stored; upgrade it now
+                        user.password = password_hasher.hash(password)
+                        db.session.commit()
+                except PasswordHasherBusy:
+                    pass # Keep the old hash; it gets upgraded on a later login
                 flash('Logged in succesfully', category='success')
                 login_user(user, remember=True) # <--- Logs the user into the session
                 return redirect(url_for('views.home'))
@@ -56,7 +69,11 @@ def signup():
         elif len(password1) < 3:
             flash('Passwords must be atleast 3 characters', category='error')
         else:
-            new_user = User(email=email, userName=userName, password=generate_password_hash(password1))
+            try:
+                password_hash = password_hasher.hash(password1)
+            except PasswordHasherBusy:
+                return too_many_requests(1, "Too many signups right now. Please try again in a moment.")
+            new_user = User(email=email, userName=userName, password=password_hash)
             db.session.add(new_user)
             db.session.commit()
             login_user(new_user, remember=True) # Optional: Log user in directly after signup
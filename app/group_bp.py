@@ -1,16 +1,25 @@
 # app/group_bp.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 from datetime import date, datetime # Added datetime for precise timestamps
 from sqlalchemy import func, and_
+from sqlalchemy.orm import selectinload
 
-from . import db
-from .models import Group, GroupMember, PetImage, User, Vote, VotingRound # NEW: Import VotingRound
+from . import db, limiter, shard_router
+from .limits import too_many_requests
+from .uploads import UploadRejected, image_upload, save_upload
+from .models import Group, GroupIndex, GroupMember, PetImage, User, Vote, VotingRound # NEW: Import VotingRound
 
 group_bp = Blueprint('group_bp', __name__)
 
+@group_bp.url_value_preprocessor
+def select_group_shard(endpoint, values):
+    # Every route that works on a single group carries its id in the URL
+    if values and 'group_id' in values:
+        shard_router.use_group(values['group_id'])
+
 def allowed_file(filename):
     if not filename:
         return False
@@ -123,8 +132,14 @@ def end_voting_round(group_id, current_round_id):
 @group_bp.route('/groups')
 @login_required
 def list_groups():
-    groups = Group.query.all()
-    user_memberships = {member.group_id for member in current_user.group_memberships}
+    # Gather groups from every shard (just the one database unless sharding is on).
+    # Members are loaded while their shard is selected, since the template reads them later.
+    groups = []
+    for shard_key in shard_router.shard_keys():
+        shard_router.use_shard(shard_key)
+        groups.extend(Group.query.options(selectinload(Group.members)).all())
+    groups.sort(key=lambda grp: grp.id)
+    user_memberships = {member.group_id for grp in groups for member in grp.members if member.user_id == current_user.id}
     
     # Global Leaderboard
     leaderboard = User.query.order_by(User.total_wins.desc()).limit(10).all()
@@ -143,14 +158,32 @@ def create_group():
             flash('Group name cannot be empty!', 'error')
             return redirect(url_for('group_bp.create_group'))
 
-        existing_group = Group.query.filter_by(name=group_name).first()
+        if shard_router.enabled:
+            existing_group = GroupIndex.query.filter_by(name=group_name).first()
+        else:
+            existing_group = Group.query.filter_by(name=group_name).first()
         if existing_group:
             flash('A group with this name already exists.', 'error')
             return redirect(url_for('group_bp.create_group'))
 
         new_group = Group(name=group_name, creator_id=current_user.id)
+        if shard_router.enabled:
+            # The central index hands out the id, which also decides the group's shard
+            index_entry = GroupIndex(name=group_name)
+            db.session.add(index_entry)
+            db.session.commit()
+            new_group.id = index_entry.id
+            shard_router.use_group(new_group.id)
         db.session.add(new_group)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if shard_router.enabled:
+                # Release the name again so it isn't reserved by a group that doesn't exist
+                db.session.delete(index_entry)
+                db.session.commit()
+            raise
 
         # Make the creator a member automatically
         member = GroupMember(user_id=current_user.id, group_id=new_group.id)
@@ -180,12 +213,23 @@ def join_group(group_id):
     return redirect(url_for('group_bp.group_detail', group_id=group_id))
 
 
-@group_bp.route('/vote_image/<int:image_id>', methods=['POST'])
+@group_bp.route('/group/<int:group_id>/vote_image/<int:image_id>', methods=['POST'])
 @login_required
-def vote_image(image_id):
+def vote_image(group_id, image_id):
+    # Per-user check runs before any database work so spammed clicks stay cheap
+    retry_after = limiter.check_user('vote', current_user.id)
+    if retry_after:
+        return too_many_requests(retry_after, "You're voting too fast. Please wait a moment.", as_json=True)
+
     image = PetImage.query.get_or_404(image_id)
+    if image.group_id != group_id:
+        abort(404)
     group = image.group_images # Access the group through the relationship
-    
+
+    retry_after = limiter.check_group('vote', group.id)
+    if retry_after:
+        return too_many_requests(retry_after, "This group is busy. Please try again shortly.", as_json=True)
+
     current_round = get_current_voting_round(group.id)
 
     if not current_round:
@@ -220,6 +264,10 @@ def vote_image(image_id):
     game_ended_early = False
     winner_info = None
 
+    # Cap concurrent writers per group; the slot is released when the request ends
+    if not limiter.acquire_write_slot(group.id):
+        return too_many_requests(1, "This group is busy. Please try again shortly.", as_json=True)
+
     if existing_vote_in_round:
         if existing_vote_in_round.pet_image_id == image_id:
             # Case 1: User already voted for THIS image in this round -> Unvote
@@ -353,7 +401,14 @@ def vote_image(image_id):
 
 @group_bp.route('/group/<int:group_id>', methods=['GET', 'POST'])
 @login_required
+@image_upload
 def group_detail(group_id):
+    if request.method == 'POST':
+        # Reject floods before touching the database or parsing the upload body
+        retry_after = limiter.check_user('upload', current_user.id) or limiter.check_group('upload', group_id)
+        if retry_after:
+            return too_many_requests(retry_after, "Too many uploads. Please wait a moment and try again.")
+
     group = Group.query.get_or_404(group_id)
     is_member = GroupMember.query.filter_by(user_id=current_user.id, group_id=group_id).first()
 
@@ -420,7 +475,19 @@ def group_detail(group_id):
             flash("Cannot upload image. No active voting round. This might happen if the group is new and doesn't meet minimum members, or a round just ended.", "error")
             return redirect(request.url)
 
-        if 'pet_image' not in request.files:
+        # Checked before the body is parsed so a refused upload is never read
+        if already_uploaded_this_round:
+            flash('You can only upload one image per round to this group.', 'error')
+            return redirect(request.url)
+
+        # The upload is validated from its header while the body is parsed
+        try:
+            has_file_part = 'pet_image' in request.files
+        except UploadRejected as e:
+            flash(e.description, 'error')
+            return redirect(request.url)
+
+        if not has_file_part:
             flash('No file part', 'error')
             return redirect(request.url)
 
@@ -434,9 +501,8 @@ def group_detail(group_id):
             flash('Invalid file type. Allowed: png, jpg, jpeg, gif', 'error')
             return redirect(request.url)
 
-        if already_uploaded_this_round:
-            flash('You can only upload one image per round to this group.', 'error')
-            return redirect(request.url)
+        if not limiter.acquire_write_slot(group.id):
+            return too_many_requests(1, "This group is busy. Please try again shortly.")
 
         if file:
             timestamp_str = datetime.now().strftime('%Y%m%d%H%M%S%f')
@@ -444,7 +510,10 @@ def group_detail(group_id):
             filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
             
             try:
-                file.save(filepath)
+                save_upload(file, filepath)
+            except UploadRejected as e:
+                flash(e.description, 'error')
+                return redirect(request.url)
             except Exception as e:
                 flash(f"Error saving image: {e}", "error")
                 return redirect(request.url)
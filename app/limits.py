@@ -0,0 +1,149 @@
+# app/limits.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, make_response
+
+
+class MemoryStore:
+    """
+    In-process token bucket store. Buckets are keyed by an arbitrary string
+    (e.g. "vote:user:3") and refilled lazily whenever they are touched.
+    At most `max_keys` buckets are kept; the least recently used is dropped first.
+
+    Any object with the same ``take`` method can be passed as the
+    RATELIMIT_STORE config value to share buckets between workers.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last_refill_monotonic), oldest first
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, per_second, cost=1):
+        """
+        Tries to take `cost` tokens from the bucket for `key`.
+        Returns 0 if the request is allowed, otherwise the number of seconds
+        until enough tokens will be available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return 0
+        return (cost - tokens) / per_second if per_second > 0 else 60.0
+
+
+class _LimiterState:
+    """Per-app limiter state, kept in app.extensions['limiter']."""
+
+    def __init__(self, store):
+        self.store = store
+        self.in_flight = {}  # group_id -> number of writes currently running
+        self.in_flight_lock = threading.Lock()
+
+
+class Limiter:
+    """
+    Admission control for the write-heavy endpoints (voting and uploads).
+
+    Two token buckets are checked per request: one per user and one per group,
+    so a single user cannot spam toggles and a busy group cannot monopolise the
+    database writer. On top of that, the number of concurrent writes per group
+    is capped; slots are released automatically when the request is torn down.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_USER_BURST', 10)
+        app.config.setdefault('RATELIMIT_USER_PER_SECOND', 2.0)
+        app.config.setdefault('RATELIMIT_GROUP_BURST', 60)
+        app.config.setdefault('RATELIMIT_GROUP_PER_SECOND', 20.0)
+        app.config.setdefault('RATELIMIT_GROUP_MAX_IN_FLIGHT', 4)
+        app.config.setdefault('RATELIMIT_STORE', None)
+
+        app.extensions['limiter'] = _LimiterState(app.config['RATELIMIT_STORE'] or MemoryStore())
+        app.teardown_request(self._release_slots)
+
+    @property
+    def _state(self):
+        return current_app.extensions['limiter']
+
+    @property
+    def enabled(self):
+        return current_app.config['RATELIMIT_ENABLED']
+
+    def check_user(self, action, user_id):
+        """Returns 0 if the user may perform `action`, otherwise a retry delay in seconds."""
+        if not self.enabled:
+            return 0
+        return self._state.store.take(
+            f"{action}:user:{user_id}",
+            current_app.config['RATELIMIT_USER_BURST'],
+            current_app.config['RATELIMIT_USER_PER_SECOND']
+        )
+
+    def check_group(self, action, group_id):
+        """Returns 0 if the group may accept `action`, otherwise a retry delay in seconds."""
+        if not self.enabled:
+            return 0
+        return self._state.store.take(
+            f"{action}:group:{group_id}",
+            current_app.config['RATELIMIT_GROUP_BURST'],
+            current_app.config['RATELIMIT_GROUP_PER_SECOND']
+        )
+
+    def acquire_write_slot(self, group_id):
+        """
+        Reserves one of the group's in-flight write slots for the rest of the request.
+        Returns False if the group is already at its cap.
+        """
+        if not self.enabled:
+            return True
+        limit = current_app.config['RATELIMIT_GROUP_MAX_IN_FLIGHT']
+        state = self._state
+        with state.in_flight_lock:
+            running = state.in_flight.get(group_id, 0)
+            if running >= limit:
+                return False
+            state.in_flight[group_id] = running + 1
+        g.setdefault('_limiter_slots', []).append(group_id)
+        return True
+
+    def _release_slots(self, exc=None):
+        slots = g.pop('_limiter_slots', None)
+        if not slots:
+            return
+        state = self._state
+        with state.in_flight_lock:
+            for group_id in slots:
+                running = state.in_flight.get(group_id, 0) - 1
+                if running > 0:
+                    state.in_flight[group_id] = running
+                else:
+                    state.in_flight.pop(group_id, None)
+
+
+def too_many_requests(retry_after, message="Too many requests. Please slow down.", as_json=False):
+    """Builds a minimal 429 response with a Retry-After header (whole seconds, at least 1)."""
+    if as_json:
+        response = make_response(jsonify({'success': False, 'message': message}), 429)
+    else:
+        response = make_response(message, 429)
+        response.mimetype = 'text/plain'
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
@@ -32,6 +32,12 @@ class Group(db.Model):
     group_pet_images = db.relationship('PetImage', backref='group_images')
     voting_rounds = db.relationship('VotingRound', back_populates='group', cascade="all, delete-orphan")
 
+class GroupIndex(db.Model):
+    # Central list of group ids and names; only used when SHARD_COUNT is set
+    __tablename__ = 'group_index'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
 class GroupMember(db.Model):
     __tablename__ = 'group_member'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
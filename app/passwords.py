@@ -0,0 +1,127 @@
+# app/passwords.py
+import os
+import threading
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are already queued; the caller should answer 429."""
+
+
+class _HasherState:
+    """Per-app hashing state, kept in app.extensions['password_hasher']."""
+
+    def __init__(self, max_pending):
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.canonical_methods = {}
+
+
+class PasswordHasher:
+    """
+    Runs the password KDF on a small process pool so request threads only wait
+    on a future instead of holding the GIL for the whole hash.
+
+    PASSWORD_HASH_METHOD and PASSWORD_SALT_LENGTH are passed straight to
+    werkzeug's generate_password_hash. Stored hashes made with other settings
+    are reported by `needs_rehash` so they can be upgraded on the next login.
+    Setting PASSWORD_HASH_WORKERS to 0 hashes inline (useful for the CLI and tests).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        # Requests beyond this many queued hashes are turned away instead of piling up
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 64)
+
+        app.extensions['password_hasher'] = _HasherState(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    @property
+    def _state(self):
+        return current_app.extensions['password_hasher']
+
+    def _get_pool(self, state):
+        if state.pool is None:
+            with state.pool_lock:
+                if state.pool is None:
+                    # Imported here so `import app` doesn't pull in multiprocessing
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    # Spawned workers re-import the main module (e.g. main.py runs create_app()),
+                    # which is cheap now that startup has no side effects
+                    state.pool = ProcessPoolExecutor(
+                        max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return state.pool
+
+    def _run(self, func, *args):
+        if not current_app.config['PASSWORD_HASH_WORKERS']:
+            return func(*args)
+        from concurrent.futures.process import BrokenProcessPool
+
+        state = self._state
+        if not state.pending.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            for _ in range(2):
+                pool = self._get_pool(state)
+                try:
+                    return pool.submit(func, *args).result()
+                except BrokenProcessPool:
+                    # A worker died (OOM killer, SIGKILL, ...); start a fresh pool and retry once
+                    self._discard_pool(state, pool)
+            # Still broken: hash inline rather than failing the request
+            return func(*args)
+        finally:
+            state.pending.release()
+
+    def _discard_pool(self, state, pool):
+        with state.pool_lock:
+            if state.pool is pool:
+                state.pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password):
+        return self._run(
+            generate_password_hash,
+            password,
+            current_app.config['PASSWORD_HASH_METHOD'],
+            current_app.config['PASSWORD_SALT_LENGTH']
+        )
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with a different method, cost or salt length than configured."""
+        if pwhash.count('$') < 2:
+            return True
+        method, salt, _ = pwhash.split('$', 2)
+        return (method != self._canonical_method()
+                or len(salt) != current_app.config['PASSWORD_SALT_LENGTH'])
+
+    def _canonical_method(self):
+        # werkzeug fills in default parameters (e.g. 'scrypt' -> 'scrypt:32768:8:1'),
+        # so compare against what it actually writes for the configured method
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        canonical_methods = self._state.canonical_methods
+        if method not in canonical_methods:
+            canonical_methods[method] = self._run(generate_password_hash, '', method, 1).split('$', 1)[0]
+        return canonical_methods[method]
+
+    def shutdown(self):
+        """Stops the current app's worker pool; it is started again on the next hash."""
+        state = self._state
+        with state.pool_lock:
+            pool, state.pool = state.pool, None
+        if pool is not None:
+            pool.shutdown()
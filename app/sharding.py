@@ -0,0 +1,120 @@
+# app/sharding.py
+import os
+
+import sqlalchemy as sa
+from flask import current_app, g
+from flask_sqlalchemy.session import Session
+
+# Everything belonging to a group lives on that group's shard; users, notes and the
+# group index stay on the central database
+SHARDED_TABLES = {'group', 'group_member', 'voting_round', 'pet_image', 'vote'}
+
+
+class ShardRouter:
+    """
+    Optional horizontal sharding of group data across SHARD_COUNT SQLite files.
+
+    A group's shard is `group_id % SHARD_COUNT`. Group ids are handed out by the
+    central GroupIndex table so they stay unique across shards. Views select the
+    shard for the request with `use_group`, and ShardedSession then routes
+    queries on SHARDED_TABLES to that shard's engine. With SHARD_COUNT = 0 (the
+    default) everything stays in the single database.
+
+    Must be initialised before the SQLAlchemy extension, which reads the binds.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SHARD_COUNT', 0)
+
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for i in range(app.config['SHARD_COUNT']):
+            binds.setdefault(f'shard{i}', f"sqlite:///{os.path.join(app.instance_path, f'shard{i}.db')}")
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['shard_router'] = self
+
+    @property
+    def enabled(self):
+        return bool(current_app.config['SHARD_COUNT'])
+
+    def shard_keys(self):
+        """Bind keys of every shard, or [None] (the default database) when sharding is off."""
+        if not self.enabled:
+            return [None]
+        return [f'shard{i}' for i in range(current_app.config['SHARD_COUNT'])]
+
+    def shard_for_group(self, group_id):
+        if not self.enabled:
+            return None
+        return f"shard{group_id % current_app.config['SHARD_COUNT']}"
+
+    def use_group(self, group_id):
+        self.use_shard(self.shard_for_group(group_id))
+
+    def use_shard(self, key):
+        g.shard_key = key
+
+    def create_all(self, db):
+        """
+        Creates central tables on the default database and group tables on every shard.
+
+        Existing group data is not migrated. If the central database still holds
+        rows in SHARDED_TABLES (an install that ran before sharding was turned on),
+        this raises instead of creating shards that would hide those groups.
+        """
+        if not self.enabled:
+            # Not db.create_all(): that also visits shard binds another app in this process registered
+            db.metadata.create_all(bind=db.engines[None])
+            return
+        leftover = self._unsharded_rows(db.engines[None])
+        if leftover:
+            counts = ', '.join(f"{name}: {count}" for name, count in sorted(leftover.items()))
+            raise RuntimeError(
+                f"The central database still holds group data ({counts}). "
+                "Sharding does not migrate existing groups; use a fresh database or unset SHARD_COUNT."
+            )
+        central = [table for table in db.metadata.tables.values() if table.name not in SHARDED_TABLES]
+        sharded = [table for table in db.metadata.tables.values() if table.name in SHARDED_TABLES]
+        db.metadata.create_all(bind=db.engines[None], tables=central)
+        for key in self.shard_keys():
+            db.metadata.create_all(bind=db.engines[key], tables=sharded)
+
+
+    def _unsharded_rows(self, engine):
+        existing = set(sa.inspect(engine).get_table_names())
+        counts = {}
+        with engine.connect() as conn:
+            for name in SHARDED_TABLES & existing:
+                count = conn.execute(sa.select(sa.func.count()).select_from(sa.table(name))).scalar()
+                if count:
+                    counts[name] = count
+        return counts
+
+
+class ShardedSession(Session):
+    """Session that sends group-scoped tables to the shard selected for the current request."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            table = _table_for(mapper, clause)
+            if table is not None and table.name in SHARDED_TABLES:
+                router = current_app.extensions['shard_router']
+                if router.enabled:
+                    key = g.get('shard_key')
+                    if key is None:
+                        raise RuntimeError(f"No shard selected for table '{table.name}'. Call shard_router.use_group() first.")
+                    return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _table_for(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table
+    if isinstance(clause, sa.Table):
+        return clause
+    if isinstance(clause, sa.sql.expression.UpdateBase) and isinstance(clause.table, sa.Table):
+        return clause.table
+    return None
@@ -0,0 +1,247 @@
+# app/uploads.py
+import io
+import os
+import struct
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import HTTPException
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+GIF_SIGNATURES = (b'GIF87a', b'GIF89a')
+JPEG_SOI = b'\xff\xd8'
+# Start-of-frame markers carry the image dimensions (DHT/JPG/DAC share the range but don't)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _file_mode():
+    # os.umask can only be read by setting it, so do it once at import rather than per upload
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Mode a plain open() would give the file, which is what file.save produced before
+UPLOAD_FILE_MODE = _file_mode()
+
+
+class UploadRejected(HTTPException):
+    code = 415
+    description = "The uploaded file is not a supported image."
+
+
+def sniff_image(head):
+    """
+    Reads the image type and dimensions from the first bytes of a file
+    without decoding any pixel data.
+    Returns (kind, width, height), or None if more bytes are needed.
+    Raises UploadRejected if the bytes cannot be a supported image.
+    """
+    if not head:
+        return None
+
+    if PNG_SIGNATURE.startswith(head[:8]):
+        # Signature (8) + IHDR length (4) + b'IHDR' (4) + width (4) + height (4)
+        if len(head) < 24:
+            return None
+        if head[12:16] != b'IHDR':
+            raise UploadRejected("Corrupt PNG header.")
+        width, height = struct.unpack('>II', head[16:24])
+        return 'png', width, height
+
+    if any(sig.startswith(head[:6]) for sig in GIF_SIGNATURES):
+        # Signature (6) + logical screen width (2) + height (2)
+        if len(head) < 10:
+            return None
+        width, height = struct.unpack('<HH', head[6:10])
+        return 'gif', width, height
+
+    if JPEG_SOI.startswith(head[:2]):
+        return _sniff_jpeg(head)
+
+    raise UploadRejected()
+
+
+def _sniff_jpeg(head):
+    # Walk the segment list until the first start-of-frame marker
+    pos = 2
+    while True:
+        if len(head) < pos + 4:
+            return None
+        if head[pos] != 0xFF:
+            raise UploadRejected("Corrupt JPEG header.")
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Standalone markers have no length field
+            pos += 2
+            continue
+        segment_length = struct.unpack('>H', head[pos + 2:pos + 4])[0]
+        if segment_length < 2:
+            raise UploadRejected("Corrupt JPEG header.")
+        if marker in JPEG_SOF_MARKERS:
+            # Length (2) + precision (1) + height (2) + width (2)
+            if len(head) < pos + 9:
+                return None
+            height, width = struct.unpack('>HH', head[pos + 5:pos + 9])
+            return 'jpeg', width, height
+        if marker in (0xD9, 0xDA):
+            # End of image / start of scan before any frame header
+            raise UploadRejected("Corrupt JPEG header.")
+        pos += 2 + segment_length
+
+
+class ImageUploadStream(io.RawIOBase):
+    """
+    Write target for an uploaded image while the multipart body is being parsed.
+
+    The first chunks are held in memory until the image header can be read.
+    Anything that isn't a supported image, or whose dimensions are too large,
+    is rejected right there so the rest of the body is never read. Once the
+    header is accepted, the buffered bytes and every later chunk are written
+    straight to a temporary file in the upload folder, which `commit` moves
+    into place. The temporary file stays owner-only (mkstemp's 0600) while it
+    is being written, so a web server serving the folder can't hand out a
+    partial upload.
+    """
+
+    def __init__(self, upload_dir, allowed_kinds, max_dimension, max_pixels, sniff_limit):
+        self.upload_dir = upload_dir
+        self.allowed_kinds = allowed_kinds
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.sniff_limit = sniff_limit
+
+        self.kind = None
+        self.width = None
+        self.height = None
+        self.size = 0
+
+        self._head = bytearray()
+        self._file = None
+        self._temp_path = None
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return self._file is not None
+
+    def seekable(self):
+        return self._file is not None
+
+    def write(self, data):
+        self.size += len(data)
+        if self._file is not None:
+            return self._file.write(data)
+
+        self._head += data
+        info = sniff_image(bytes(self._head))
+        if info is None:
+            if len(self._head) >= self.sniff_limit:
+                raise UploadRejected("Could not find the image header.")
+            return len(data)
+
+        self._accept(*info)
+        self._file.write(self._head)
+        self._head = None
+        return len(data)
+
+    def _accept(self, kind, width, height):
+        if kind not in self.allowed_kinds:
+            raise UploadRejected()
+        if width == 0 or height == 0:
+            raise UploadRejected("The image has no pixels.")
+        if width > self.max_dimension or height > self.max_dimension:
+            raise UploadRejected(f"Image is too large. Maximum size is {self.max_dimension}x{self.max_dimension} pixels.")
+        if width * height > self.max_pixels:
+            raise UploadRejected("Image has too many pixels.")
+
+        self.kind, self.width, self.height = kind, width, height
+        os.makedirs(self.upload_dir, exist_ok=True)
+        fd, self._temp_path = tempfile.mkstemp(prefix='.upload-', dir=self.upload_dir)
+        self._file = os.fdopen(fd, 'w+b')
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # The form parser seeks back to the start once the part is complete
+        if self._file is None:
+            if self.size == 0:
+                # Empty part, i.e. no file selected; let the view report it
+                return 0
+            raise UploadRejected()
+        return self._file.seek(offset, whence)
+
+    def read(self, size=-1):
+        if self._file is None:
+            return b''
+        return self._file.read(size)
+
+    def commit(self, filepath):
+        """Moves the accepted upload to `filepath` without copying it."""
+        if self._file is None:
+            # Only an empty part gets this far without a header being accepted
+            raise UploadRejected("The uploaded file is empty.")
+        self._file.close()
+        os.chmod(self._temp_path, UPLOAD_FILE_MODE)
+        os.replace(self._temp_path, filepath)
+        self._temp_path = None
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+        super().close()
+
+
+class ImageUploadRequest(Request):
+    """Routes file parts for views marked with @image_upload through ImageUploadStream."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint)
+        if not getattr(view, 'streams_image_uploads', False):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        config = current_app.config
+        if filename and filename.rsplit('.', 1)[-1].lower() not in config['ALLOWED_EXTENSIONS']:
+            # The part headers arrive before its body, so this costs nothing to check
+            raise UploadRejected("Invalid file type. Allowed: png, jpg, jpeg, gif")
+
+        allowed_kinds = set(config['ALLOWED_EXTENSIONS'])
+        if 'jpg' in allowed_kinds:
+            allowed_kinds.add('jpeg')
+        stream = ImageUploadStream(
+            config['UPLOAD_FOLDER'],
+            allowed_kinds,
+            config['UPLOAD_MAX_IMAGE_DIMENSION'],
+            config['UPLOAD_MAX_IMAGE_PIXELS'],
+            config['UPLOAD_SNIFF_LIMIT']
+        )
+        self.__dict__.setdefault('_image_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        # Also cleans up temp files for parts that were cut off mid-parse
+        super().close()
+        for stream in self.__dict__.pop('_image_streams', []):
+            stream.close()
+
+
+def image_upload(view):
+    """Marks a view so its file uploads are validated and stored while streaming."""
+    view.streams_image_uploads = True
+    return view
+
+
+def save_upload(file, filepath):
+    if isinstance(file.stream, ImageUploadStream):
+        file.stream.commit(filepath)
+    else:
+        file.save(filepath)
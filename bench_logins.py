@@ -0,0 +1,76 @@
+# bench_logins.py
+"""
+Login throughput benchmark: runs concurrent POST /login requests against a
+temporary database and reports logins per second, hashing inline and on the
+password hashing process pool.
+
+    python bench_logins.py [--logins 64] [--threads 8] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app, create_database, db, password_hasher
+from app.models import User
+
+PASSWORD = 'correct horse'
+
+
+def run(logins, threads, workers, workdir):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, f'bench_{workers}.db')}",
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'PASSWORD_HASH_WORKERS': workers,
+        'PASSWORD_HASH_MAX_PENDING': threads,
+    })
+    create_database(app)
+    with app.app_context():
+        for i in range(threads):
+            db.session.add(User(email=f'bench{i}@example.com', userName=f'bench{i}', password=password_hasher.hash(PASSWORD)))
+        db.session.commit()
+        password_hasher.needs_rehash(User.query.first().password) # Starts the pool and caches the method
+
+    failures = []
+    per_thread = logins // threads
+
+    def worker(i):
+        client = app.test_client()
+        for _ in range(per_thread):
+            response = client.post('/login', data={'userName': f'bench{i}', 'password': PASSWORD})
+            if response.status_code != 302:
+                failures.append(response.status_code)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        password_hasher.shutdown()
+    label = 'inline' if not workers else f'{workers} worker process(es)'
+    print(f"{label:>22}: {per_thread * threads / elapsed:7.1f} logins/s "
+          f"({per_thread * threads} logins, {threads} threads, {elapsed:.2f} s, {len(failures)} failed)")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ok = run(args.logins, args.threads, 0, workdir)
+        ok = run(args.logins, args.threads, args.workers, workdir) and ok
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# bench_startup.py
+"""
+Startup-time benchmark: measures `import app` + `create_app()` in fresh
+interpreters and exits non-zero if the median exceeds the budget, or if
+startup writes anything to stdout or creates files.
+
+    python bench_startup.py [--runs 7] [--budget 0.6]
+
+The default budget sits just above the current median; slower machines (CI)
+can raise it with STARTUP_BUDGET_SECONDS.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+sys.stderr.write(repr(time.perf_counter() - start))
+"""
+
+
+def measure_once(workdir):
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT_DIR, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SNIPPET],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stderr.strip().splitlines()[-1]), result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget', type=float, default=float(os.environ.get('STARTUP_BUDGET_SECONDS', 0.6)),
+                        help="Maximum median seconds for import + create_app")
+    args = parser.parse_args()
+
+    failures = []
+    before = set(os.listdir(PROJECT_ROOT_DIR))
+    with tempfile.TemporaryDirectory() as workdir:
+        measure_once(workdir) # Warm the OS file cache
+        timings = []
+        for _ in range(args.runs):
+            seconds, stdout = measure_once(workdir)
+            timings.append(seconds)
+            if stdout:
+                failures.append(f"startup printed to stdout: {stdout.strip()[:200]!r}")
+        if os.listdir(workdir):
+            failures.append(f"startup created files in the working directory: {os.listdir(workdir)}")
+    created = set(os.listdir(PROJECT_ROOT_DIR)) - before
+    if created:
+        failures.append(f"startup created files in the project: {sorted(created)}")
+
+    median = statistics.median(timings)
+    print(f"import + create_app: median {median * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+    if median > args.budget:
+        failures.append(f"median startup {median * 1000:.1f} ms is over the {args.budget * 1000:.0f} ms budget")
+
+    for failure in sorted(set(failures)):
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -67,7 +67,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const votesSpan = document.getElementById(`votes-${imageId}`);
             console.log('Votes Span for image:', votesSpan); // Added for debugging
 
-            fetch(`/vote_image/${imageId}`, {
+            fetch(targetCard.dataset.voteUrl, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -76,6 +76,11 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(response => {
                 console.log('Fetch response received:', response); // Added for debugging
+                if (response.status === 429) {
+                    // Rate limited: leave the page as it is instead of reloading
+                    console.warn('Vote rejected, retry after', response.headers.get('Retry-After'), 'seconds');
+                    return null;
+                }
                 if (!response.ok) {
                     return response.json().then(errorData => {
                         throw new Error(errorData.message || `HTTP error! status: ${response.status}`);
@@ -85,6 +90,9 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 console.log('Fetch data received:', data); // Added for debugging
+                if (!data) {
+                    return;
+                }
                 if (data.success) {
                     const currentImageCard = document.querySelector(`.image-card-clickable-container[data-image-id="${imageId}"]`);
                     if (currentImageCard && votesSpan) {
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Lets the tests import the app package without installing it
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
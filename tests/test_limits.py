@@ -0,0 +1,88 @@
+# tests/test_limits.py
+import pytest
+from flask import Flask, json
+
+from app import limits
+from app.limits import Limiter, MemoryStore, too_many_requests
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(limits, 'time', clock)
+    return clock
+
+
+def test_bucket_runs_out_and_refills(clock):
+    store = MemoryStore()
+    for _ in range(3):
+        assert store.take('vote:user:1', burst=3, per_second=2.0) == 0
+    assert store.take('vote:user:1', burst=3, per_second=2.0) == pytest.approx(0.5)
+
+    clock.now += 0.25 # Half a token back
+    assert store.take('vote:user:1', burst=3, per_second=2.0) == pytest.approx(0.25)
+    clock.now += 0.25
+    assert store.take('vote:user:1', burst=3, per_second=2.0) == 0
+
+    # Refills stop at the burst size
+    clock.now += 60
+    for _ in range(3):
+        assert store.take('vote:user:1', burst=3, per_second=2.0) == 0
+    assert store.take('vote:user:1', burst=3, per_second=2.0) > 0
+
+
+def test_store_evicts_least_recently_used(clock):
+    store = MemoryStore(max_keys=2)
+    assert store.take('a', burst=1, per_second=0) == 0
+    assert store.take('b', burst=1, per_second=0) == 0
+    assert store.take('a', burst=1, per_second=0) > 0 # Rejected, but still marks 'a' as used
+    assert store.take('c', burst=1, per_second=0) == 0 # Evicts 'b'
+    assert list(store._buckets) == ['a', 'c']
+
+    # 'a' kept its empty bucket; 'b' starts over with a full one
+    assert store.take('a', burst=1, per_second=0) > 0
+    assert store.take('b', burst=1, per_second=0) == 0
+    assert list(store._buckets) == ['a', 'b']
+
+
+@pytest.mark.parametrize('retry_after, header', [(0.01, '1'), (1.0, '1'), (2.1, '3')])
+def test_too_many_requests(retry_after, header):
+    app = Flask(__name__)
+    with app.test_request_context():
+        response = too_many_requests(retry_after, "Slow down.", as_json=True)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == header
+        assert json.loads(response.get_data()) == {'success': False, 'message': "Slow down."}
+
+        response = too_many_requests(retry_after)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == header
+        assert response.mimetype == 'text/plain'
+
+
+def test_write_slots_are_released_when_a_request_fails():
+    app = Flask(__name__)
+    app.config['RATELIMIT_GROUP_MAX_IN_FLIGHT'] = 1
+    limiter = Limiter(app)
+
+    @app.route('/write/<int:group_id>')
+    def write(group_id):
+        if not limiter.acquire_write_slot(group_id):
+            return too_many_requests(1)
+        if limiter.acquire_write_slot(group_id):
+            return "cap not enforced" # A second slot for the group is over the cap
+        raise RuntimeError("write failed")
+
+    client = app.test_client()
+    for _ in range(3):
+        # 429 here would mean the failed request before it kept its slot
+        assert client.get('/write/7').status_code == 500
+    assert app.extensions['limiter'].in_flight == {}
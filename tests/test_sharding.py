@@ -0,0 +1,132 @@
+# tests/test_sharding.py
+import sqlite3
+
+import pytest
+from flask import template_rendered
+
+from app import create_app, create_database, db, shard_router
+from app.models import Group, GroupMember, PetImage, User, VotingRound
+
+
+def make_app(tmp_path, shard_count=2):
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'database.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'SHARD_COUNT': shard_count,
+        'RATELIMIT_ENABLED': False,
+    }
+    if shard_count:
+        config['SQLALCHEMY_BINDS'] = {f'shard{i}': f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(shard_count)}
+    app = create_app(config)
+    app.config['TESTING'] = True
+    # Keep compiled templates out of the project's instance/ folder
+    app.jinja_env.bytecode_cache.directory = str(tmp_path / 'jinja_cache')
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    create_database(app)
+    with app.app_context():
+        db.session.add_all([User(id=1, userName='alice', email='alice@example.com'), User(id=2, userName='bob', email='bob@example.com')])
+        db.session.commit()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def login(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def group_ids(path):
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute('SELECT id FROM "group" ORDER BY id')]
+
+
+def add_image(app, group_id, user_id):
+    with app.app_context():
+        shard_router.use_group(group_id)
+        voting_round = VotingRound.query.filter_by(group_id=group_id).first()
+        image = PetImage(filename='cat.png', user_id=user_id, group_id=group_id, round_id=voting_round.id)
+        db.session.add(image)
+        db.session.commit()
+        return image.id
+
+
+def test_groups_are_spread_over_shards(app, tmp_path):
+    client = login(app, 1)
+    for name in ('one', 'two', 'three'):
+        assert client.post('/create_group', data={'group_name': name}).status_code == 302
+
+    # Ids come from the central index; group_id % 2 picks the shard
+    assert group_ids(tmp_path / 'shard1.db') == [1, 3]
+    assert group_ids(tmp_path / 'shard0.db') == [2]
+    with sqlite3.connect(tmp_path / 'database.db') as conn:
+        assert [row[0] for row in conn.execute('SELECT name FROM group_index ORDER BY id')] == ['one', 'two', 'three']
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'group'").fetchall()
+
+
+def test_group_list_covers_every_shard(app):
+    login(app, 1).post('/create_group', data={'group_name': 'one'})
+    bob = login(app, 2)
+    bob.post('/create_group', data={'group_name': 'two'})
+    bob.get('/join_group/1')
+
+    rendered = []
+    def record(sender, template, context, **extra):
+        rendered.append(context)
+    with template_rendered.connected_to(record, app):
+        response = login(app, 1).get('/groups')
+    assert response.status_code == 200
+
+    context = rendered[0]
+    assert [(group.id, group.name) for group in context['groups']] == [(1, 'one'), (2, 'two')]
+    assert [sorted(member.user_id for member in group.members) for group in context['groups']] == [[1, 2], [2]]
+    assert context['user_memberships'] == {1}
+
+
+def test_vote_on_image_from_another_group_is_404(app):
+    client = login(app, 1)
+    for name in ('one', 'two', 'three'):
+        client.post('/create_group', data={'group_name': name})
+    same_shard_image = add_image(app, 3, 1) # Group 3 shares shard1 with group 1
+    other_shard_image = add_image(app, 2, 1)
+
+    bob = login(app, 2)
+    assert bob.post(f'/group/1/vote_image/{same_shard_image}').status_code == 404
+    assert bob.post(f'/group/1/vote_image/{other_shard_image}').status_code == 404
+
+
+def test_group_tables_need_a_selected_shard(app):
+    with app.app_context():
+        with pytest.raises(RuntimeError, match='No shard selected'):
+            Group.query.all()
+        # Central tables don't
+        assert User.query.count() == 2
+
+
+def test_create_database_refuses_existing_groups(tmp_path):
+    unsharded = make_app(tmp_path, shard_count=0)
+    create_database(unsharded)
+    with unsharded.app_context():
+        db.session.add(User(id=1, userName='alice', email='alice@example.com'))
+        db.session.add(Group(id=1, name='one', creator_id=1))
+        db.session.add(GroupMember(user_id=1, group_id=1))
+        db.session.commit()
+        db.engines[None].dispose()
+
+    sharded = make_app(tmp_path)
+    with pytest.raises(RuntimeError, match=r'group: 1, group_member: 1'):
+        create_database(sharded)
+    with sharded.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    assert not (tmp_path / 'shard0.db').exists()
+    assert not (tmp_path / 'shard1.db').exists()
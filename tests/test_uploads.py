@@ -0,0 +1,135 @@
+# tests/test_uploads.py
+import os
+import stat
+import struct
+
+import pytest
+
+from app.uploads import UPLOAD_FILE_MODE, ImageUploadStream, UploadRejected, sniff_image
+
+
+def png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+
+
+def gif_header(width, height):
+    return b'GIF89a' + struct.pack('<HH', width, height) + b'\x00\x00\x00'
+
+
+def jpeg_segment(marker, payload):
+    return b'\xff' + bytes([marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def jpeg_header(width, height, before_sof=b''):
+    sof = jpeg_segment(0xC0, b'\x08' + struct.pack('>HH', height, width) + b'\x03')
+    return b'\xff\xd8' + before_sof + sof
+
+
+def make_stream(tmp_path, max_dimension=8000, max_pixels=40 * 1000 * 1000):
+    return ImageUploadStream(str(tmp_path), {'png', 'gif', 'jpeg', 'jpg'}, max_dimension, max_pixels, 256 * 1024)
+
+
+@pytest.mark.parametrize('header, needed', [
+    (png_header(640, 480), 24), # Signature + IHDR length, type, width, height
+    (gif_header(640, 480), 10), # Signature + logical screen width, height
+    (jpeg_header(640, 480), 11), # SOI + SOF marker, length, precision, height, width
+])
+def test_truncated_headers_need_more_bytes(header, needed):
+    for cut in range(needed):
+        assert sniff_image(header[:cut]) is None
+    assert sniff_image(header[:needed]) is not None
+
+
+@pytest.mark.parametrize('header, kind', [
+    (png_header(640, 480), 'png'),
+    (gif_header(640, 480), 'gif'),
+    (jpeg_header(640, 480), 'jpeg'),
+])
+def test_complete_headers(header, kind):
+    assert sniff_image(header) == (kind, 640, 480)
+
+
+def test_jpeg_skips_app_segments_and_fill_bytes():
+    before_sof = (
+        jpeg_segment(0xE0, b'JFIF\x00' + b'\x00' * 9)
+        + jpeg_segment(0xE1, b'Exif\x00\x00' + b'\x00' * 2000)
+        + b'\xff\xff\xff'
+        + jpeg_segment(0xDB, b'\x00' * 65)
+    )
+    header = jpeg_header(1024, 768, before_sof)
+    assert sniff_image(header) == ('jpeg', 1024, 768)
+    # Cut inside the Exif segment: not enough bytes yet
+    assert sniff_image(header[:500]) is None
+
+
+def test_jpeg_scan_before_frame_is_rejected():
+    with pytest.raises(UploadRejected):
+        sniff_image(b'\xff\xd8' + jpeg_segment(0xDA, b'\x00' * 10))
+
+
+@pytest.mark.parametrize('data', [b'hello world', b'<svg xmlns="http://www.w3.org/2000/svg">', b'\x89PNG\r\n\x1a\n' + b'\x00' * 4 + b'IDAT' + b'\x00' * 8])
+def test_non_images_are_rejected(data):
+    with pytest.raises(UploadRejected):
+        sniff_image(data)
+
+
+def test_stream_accepts_image_and_commits(tmp_path):
+    stream = make_stream(tmp_path)
+    data = png_header(20, 10) + b'\x00' * 1000
+    stream.write(data[:10])
+    stream.write(data[10:])
+    stream.seek(0)
+    assert (stream.kind, stream.width, stream.height) == ('png', 20, 10)
+
+    target = tmp_path / 'saved.png'
+    stream.commit(str(target))
+    stream.close()
+    assert target.read_bytes() == data
+    assert os.listdir(tmp_path) == ['saved.png']
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permission bits')
+def test_committed_file_gets_regular_mode(tmp_path):
+    stream = make_stream(tmp_path)
+    stream.write(png_header(20, 10))
+    # Still owner-only while the upload is in progress
+    assert stat.S_IMODE(os.stat(stream._temp_path).st_mode) == 0o600
+    stream.seek(0)
+
+    target = tmp_path / 'saved.png'
+    stream.commit(str(target))
+    stream.close()
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert UPLOAD_FILE_MODE == 0o666 & ~umask
+    assert stat.S_IMODE(os.stat(target).st_mode) == UPLOAD_FILE_MODE
+
+
+def test_stream_rejects_oversized_dimensions(tmp_path):
+    stream = make_stream(tmp_path, max_dimension=4000)
+    with pytest.raises(UploadRejected, match='too large'):
+        stream.write(png_header(4001, 10))
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_rejects_pixel_bombs(tmp_path):
+    stream = make_stream(tmp_path, max_dimension=60000, max_pixels=1000 * 1000)
+    with pytest.raises(UploadRejected, match='too many pixels'):
+        stream.write(gif_header(50000, 50000))
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_rejects_empty_part_on_commit(tmp_path):
+    stream = make_stream(tmp_path)
+    stream.write(b'')
+    assert stream.seek(0) == 0 # The view reports a missing filename itself
+    with pytest.raises(UploadRejected, match='empty'):
+        stream.commit(str(tmp_path / 'cat.png'))
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_rejects_part_that_ends_before_header(tmp_path):
+    stream = make_stream(tmp_path)
+    stream.write(png_header(20, 10)[:12])
+    with pytest.raises(UploadRejected):
+        stream.seek(0)